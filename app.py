@@ -1,22 +1,36 @@
 import os
 import io
+import copy
 import time
 import uuid
+import shutil
+import hashlib
 import tempfile
 import zipfile
 import re
+import sys
+import queue
+import threading
+import multiprocessing
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import OrderedDict
+from itertools import islice, repeat
 
 from flask import (
     Flask,
     render_template,
     request,
-    send_file,
+    send_from_directory,
     redirect,
     url_for,
     flash,
 )
+import numpy as np
 import pandas as pd
+import xlsxwriter
 from docxtpl import DocxTemplate
+from jinja2 import Environment
 from docx2pdf import convert
 
 
@@ -28,39 +42,487 @@ app = Flask(
 
 app.secret_key = "super-secret-key"
 
-# Store generated ZIPs in memory
+# Generated ZIPs are kept on disk and removed after ZIP_TTL seconds
+app.config["ZIP_CACHE_DIR"] = os.environ.get(
+    "ZIP_CACHE_DIR", os.path.join(tempfile.gettempdir(), "lcf_nda_zips")
+)
+app.config["ZIP_TTL"] = int(os.environ.get("ZIP_TTL", 30 * 60))
+os.makedirs(app.config["ZIP_CACHE_DIR"], exist_ok=True)
+
+# Behind nginx/apache, let the proxy send the ZIP files (X-Sendfile) and free the worker
+app.config["USE_X_SENDFILE"] = os.environ.get("USE_X_SENDFILE", "0") == "1"
+
+# Bound request bodies (uploads) and the number of employees per job
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_CONTENT_LENGTH", 100 * 1024 * 1024))
+app.config["MAX_ROWS"] = int(os.environ.get("MAX_ROWS", 100_000))
+
+# Rows rendered, converted and flushed into the ZIP at a time. A chunk's DOCX
+# bytes stay in memory until it is flushed, and each one is about the size of
+# the template, so a chunk also holds at most about GENERATION_CHUNK_BYTES.
+GENERATION_CHUNK = 500
+GENERATION_CHUNK_BYTES = 64 * 1024 * 1024
+
+# How often the eviction sweep runs (seconds)
+ZIP_EVICT_INTERVAL = 5 * 60
+
+# Generated ZIPs: zip_id -> (path, mtime)
 GENERATED_ZIPS = {}
 
+# Per-zip_id locks, so a download never races the eviction sweep
+ZIP_LOCKS = {}
+_zip_locks_guard = threading.Lock()
+_eviction_timer = None
+
+def _zip_lock(zip_id: str) -> threading.Lock:
+    with _zip_locks_guard:
+        return ZIP_LOCKS.setdefault(zip_id, threading.Lock())
+
+# Whether a file in ZIP_CACHE_DIR is one of ours: "<uuid4>.zip"
+def _is_generated_zip(filename: str) -> bool:
+    zip_id, ext = os.path.splitext(filename)
+    if ext != ".zip":
+        return False
+    try:
+        return str(uuid.UUID(zip_id)) == zip_id
+    except ValueError:
+        return False
+
+# Remove ZIPs older than ZIP_TTL (including leftovers from earlier runs), then reschedule.
+# ZIP_CACHE_DIR may be a shared directory, so anything not named like our
+# ZIPs is left alone.
+def _evict_expired_zips():
+    cache_dir = app.config["ZIP_CACHE_DIR"]
+    cutoff = time.time() - app.config["ZIP_TTL"]
+    try:
+        for f in os.listdir(cache_dir):
+            if not _is_generated_zip(f):
+                continue
+            path = os.path.join(cache_dir, f)
+            zip_id = os.path.splitext(f)[0]
+            with _zip_lock(zip_id):
+                try:
+                    if os.path.getmtime(path) >= cutoff:
+                        continue
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    # Still open (e.g. mid-download on Windows); retry next sweep
+                    continue
+                GENERATED_ZIPS.pop(zip_id, None)
+            with _zip_locks_guard:
+                ZIP_LOCKS.pop(zip_id, None)
+    finally:
+        _schedule_eviction()
+
+def _schedule_eviction():
+    global _eviction_timer
+    _eviction_timer = threading.Timer(ZIP_EVICT_INTERVAL, _evict_expired_zips)
+    _eviction_timer.daemon = True
+    _eviction_timer.start()
+
+# Start the sweep with the first generated ZIP
+def _ensure_eviction():
+    with _zip_locks_guard:
+        if _eviction_timer is None:
+            _schedule_eviction()
+
+# Placeholders supported in the filename template
+_FILENAME_FIELD_RE = re.compile(r"\{(emp_name|city|state|joining_date|index)\}")
+
+# Path separators, runs of whitespace, and characters that are problematic in filenames
+_SANITIZE_RE = re.compile(r"([\\/]+)|(\s+)|[:\*\?\"<>\|]+")
+
+# Replacement by matched group (match.lastindex): 1 separators, 2 whitespace, None bad chars
+_SANITIZE_REPL = {1: "-", 2: " ", None: ""}
+
+def _sanitize_repl(match: re.Match) -> str:
+    return _SANITIZE_REPL[match.lastindex]
+
 # Safe filename helper
 def sanitize_filename(name: str) -> str:
-    # remove path separators and control chars, trim
-    name = re.sub(r"[\\/]+", "-", name)
-    # replace multiple spaces with single space
-    name = re.sub(r"\s+", " ", name).strip()
-    # remove any characters that are problematic in filenames
-    name = re.sub(r"[:\*\?\"<>\|]+", "", name)
-    return name or "file"
-
-# Render a filename from template and a row (and index)
-def render_filename(template: str, row: pd.Series, idx: int) -> str:
-    # Prepare values
+    # single pass: separators -> "-", whitespace -> " ", bad chars removed; then trim
+    return _SANITIZE_RE.sub(_sanitize_repl, name).strip() or "file"
+
+# Split a filename template into ("lit", text) / ("field", name) ops once per request
+def compile_filename_template(template: str) -> list:
+    ops = []
+    for i, part in enumerate(_FILENAME_FIELD_RE.split(template)):
+        if i % 2:
+            ops.append(("field", part))
+        elif part:
+            ops.append(("lit", part))
+    return ops
+
+# Render a filename from compiled template ops and a row context (and index)
+def render_filename(fn_ops: list, context: dict, idx: int) -> str:
+    # Values are already normalized, including the formatted joining date
+    values = dict(context, index=str(idx))
+    # Fill placeholders
+    result = "".join(value if kind == "lit" else str(values[value]) for kind, value in fn_ops)
+    return sanitize_filename(result)
+
+# Make a filename unique within one job: a name already in `taken` gets " (2)",
+# " (3)", ... Compared case-insensitively, as Windows and most unzip tools do.
+def unique_filename(base_name: str, taken: set) -> str:
+    name, n = base_name, 1
+    while name.casefold() in taken:
+        n += 1
+        name = f"{base_name} ({n})"
+    taken.add(name.casefold())
+    return name
+
+# Excel engine for uploads: calamine (Rust) parses far faster than openpyxl;
+# pandas >= 2.2 supports it natively. None means the pandas default.
+EXCEL_ENGINE = (
+    "calamine"
+    if importlib.util.find_spec("python_calamine")
+    and tuple(int(x) for x in pd.__version__.split(".")[:2]) >= (2, 2)
+    else None
+)
+
+# Gender values (lower-cased) that take "his"; anything else takes "her"
+MALE_GENDERS = ("male", "m", "man", "boy")
+
+# prepare_employees() columns fed to the row loops as plain tuples,
+# and the template context key each one maps to
+RECORD_COLUMNS = ["emp_name", "city", "state", "_joining_date_fmt", "address", "his_or_her"]
+CONTEXT_KEYS = ("emp_name", "city", "state", "joining_date", "address", "his_or_her")
+
+# Normalize the employee columns once for the whole sheet instead of per row
+def prepare_employees(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    # Blank cells become empty strings; astype(str) alone leaves them as NaN
+    for c in ["emp_name", "city", "state", "address"]:
+        df[c] = df[c].fillna("").astype(str).str.strip()
+
+    # Format date; values that can't be parsed are kept as text. format="mixed"
+    # parses each cell on its own like the old per-row to_datetime() did,
+    # instead of inferring one format from the first value.
+    df["_joining_date_fmt"] = (
+        pd.to_datetime(df["joining_date"], errors="coerce", format="mixed", dayfirst=False)
+        .dt.strftime("%d-%m-%Y")
+        .fillna(df["joining_date"].fillna("").astype(str))
+    )
+
+    # Pronoun for the whole column at once; the row loops just read it
+    gender = df["gender"].fillna("").astype(str).str.strip().str.lower()
+    df["his_or_her"] = np.where(gender.isin(MALE_GENDERS), "his", "her")
+    return df
+
+# docxtpl's render pipeline (get_xml -> patch_xml -> render_xml_part) that
+# CachedTemplate hooks into; checked once at startup, otherwise rows use plain render()
+DOCXTPL_FAST_PATH = all(
+    hasattr(DocxTemplate, name) for name in ["get_xml", "patch_xml", "build_xml", "render_xml_part"]
+)
+
+# Jinja environment that compiles each distinct source only once. docxtpl hands
+# it the same XML (body, headers, footers, properties) for every row of a template.
+class CachingEnvironment(Environment):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._compiled = {}
+
+    def from_string(self, source, globals=None, template_class=None):
+        if globals or template_class:
+            return super().from_string(source, globals, template_class)
+        template = self._compiled.get(source)
+        if template is None:
+            template = self._compiled[source] = super().from_string(source)
+        return template
+
+# A Jinja tag opening, possibly split by Word's XML tags (as patch_xml() handles)
+_JINJA_TAG_RE = re.compile(rb"\{(<[^>]*>)*[\{%#]")
+
+# A parsed DOCX template plus the render work that doesn't depend on the row:
+# the body XML is extracted and patched for Jinja once, then compiled once.
+class CachedTemplate:
+
+    BODY_PART = "word/document.xml"
+
+    def __init__(self, template_path: str):
+        self.doc = DocxTemplate(template_path)
+        self.doc.init_docx()
+        self.jinja_env = CachingEnvironment()
+        self.body_xml = self.doc.patch_xml(self.doc.get_xml()) if DOCXTPL_FAST_PATH else None
+
+        # If no part other than the body has Jinja tags, rendering can only change
+        # the body. Then every other part is compressed once into base_zip and
+        # save() just appends each row's body to a copy of it.
+        with zipfile.ZipFile(template_path) as z:
+            parts = [(info.filename, z.read(info)) for info in z.infolist()]
+        names = {name for name, _ in parts}
+        self.base_zip = None
+        if (
+            self.BODY_PART in names
+            and "docProps/core.xml" in names
+            and not any(
+                _JINJA_TAG_RE.search(data)
+                for name, data in parts
+                if name != self.BODY_PART and name.endswith((".xml", ".rels"))
+            )
+        ):
+            base = io.BytesIO()
+            with zipfile.ZipFile(base, "w", zipfile.ZIP_DEFLATED) as z:
+                for name, data in parts:
+                    if name == self.BODY_PART:
+                        continue
+                    # Media is already compressed; store it as-is
+                    if name.startswith("word/media/"):
+                        z.writestr(name, data, compress_type=zipfile.ZIP_STORED)
+                    else:
+                        z.writestr(name, data)
+            self.base_zip = base.getvalue()
+
+    # Fresh DocxTemplate over a copy of the parsed document. The Document is
+    # copied rather than the DocxTemplate: its __getattr__ forwards to self.docx,
+    # which makes copy.deepcopy() recurse endlessly.
+    def _copy(self) -> DocxTemplate:
+        doc = DocxTemplate(self.doc.template_file)
+        doc.docx = copy.deepcopy(self.doc.docx)
+        return doc
+
+    # Render one row on a copy of the template
+    def render(self, context: dict) -> DocxTemplate:
+        if self.body_xml is not None:
+            doc = self._copy()
+            try:
+                # Skip get_xml()/patch_xml() and render straight from the cached body
+                doc.build_xml = lambda ctx, jinja_env=None: doc.render_xml_part(
+                    self.body_xml, doc.docx._part, ctx, jinja_env
+                )
+                doc.render(context, self.jinja_env)
+                return doc
+            except (AttributeError, TypeError):
+                # docxtpl internals diverged; use the full render below
+                pass
+
+        doc = self._copy()
+        doc.render(context)
+        return doc
+
+    # Write a rendered copy as a DOCX into an empty, seekable file object.
+    # Instead of python-docx re-serializing and re-deflating every part
+    # (embedded fonts and all), only the rendered body is compressed.
+    def save(self, doc: DocxTemplate, target):
+        if self.base_zip is None:
+            doc.save(target)
+            return
+
+        target.write(self.base_zip)
+        with zipfile.ZipFile(target, "a", zipfile.ZIP_DEFLATED) as z:
+            z.writestr(self.BODY_PART, doc.docx.part.blob)
+
+# Parsed templates per worker process, keyed by a hash of the template bytes,
+# so a template uploaded again in a later request is not parsed again (LRU)
+TEMPLATE_CACHE = OrderedDict()
+TEMPLATE_CACHE_SIZE = 16
+
+# Hash of the uploaded template, used as its TEMPLATE_CACHE key
+def hash_template(template_path: str) -> str:
+    with open(template_path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+# Load and prepare the DOCX template once; rows render on copies of it
+def _load_template(key: str, template_path: str) -> CachedTemplate:
+    cached = TEMPLATE_CACHE.get(key)
+    if cached is None:
+        cached = CachedTemplate(template_path)
+        TEMPLATE_CACHE[key] = cached
+        if len(TEMPLATE_CACHE) > TEMPLATE_CACHE_SIZE:
+            TEMPLATE_CACHE.popitem(last=False)
+    else:
+        TEMPLATE_CACHE.move_to_end(key)
+    return cached
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+# Render workers shared by all requests, so their template caches persist
+def get_render_pool() -> ProcessPoolExecutor:
+    global _render_pool
+    with _render_pool_lock:
+        # A crashed worker breaks the pool for good; start a fresh one
+        if _render_pool is None or getattr(_render_pool, "_broken", False):
+            _render_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+        return _render_pool
+
+# Generate the DOCX for a single employee row (PDFs are converted afterwards).
+# Runs in a worker process, so it must stay at module level (picklable).
+# Expects a RECORD_COLUMNS tuple. base_name is resolved by the caller and
+# unique within the job, so no two workers ever write the same file. The DOCX
+# is written to docx_dir for PDF conversion and its bytes are returned for
+# packaging.
+def _render_one(template_key: str, template_path: str, rec: tuple, base_name: str,
+                docx_dir: str) -> tuple:
+
+    context = dict(zip(CONTEXT_KEYS, rec))
+    emp_name = context["emp_name"]
+
+    word_path = os.path.join(docx_dir, base_name + ".docx")
+    docx_bytes = None
+
     try:
-        joining_date_val = pd.to_datetime(row.get("joining_date", "")).strftime("%d-%m-%Y")
-    except Exception:
-        joining_date_val = str(row.get("joining_date", ""))
-    values = {
-        "emp_name": str(row.get("emp_name", "")).strip(),
-        "city": str(row.get("city", "")).strip(),
-        "state": str(row.get("state", "")).strip(),
-        "joining_date": joining_date_val,
-        "index": str(idx),
-    }
-    # Replace placeholders
-    result = template
-    for k, v in values.items():
-        result = result.replace("{" + k + "}", v)
-    result = sanitize_filename(result)
-    return result
+        cached = _load_template(template_key, template_path)
+        doc = cached.render(context)
+
+        docx_io = io.BytesIO()
+        cached.save(doc, docx_io)
+        docx_bytes = docx_io.getvalue()
+        with open(word_path, "wb") as f:
+            f.write(docx_bytes)
+
+        status = "Success"
+
+    except Exception as e:
+        status = f"Error: {e}"
+
+    return emp_name, base_name, status, docx_bytes
+
+# Open a PDF converter that stays alive for the lifetime of a worker process.
+# Returns (convert_one, close).
+def _open_pdf_converter():
+    if sys.platform == "win32":
+        import pythoncom
+        import win32com.client
+
+        pythoncom.CoInitialize()
+        # DispatchEx starts a private Word instance for this worker
+        word = win32com.client.DispatchEx("Word.Application")
+        word.Visible = False
+        word.DisplayAlerts = 0
+
+        def convert_one(docx_path: str, pdf_path: str):
+            doc = word.Documents.Open(os.path.abspath(docx_path), ReadOnly=True)
+            try:
+                doc.SaveAs(os.path.abspath(pdf_path), FileFormat=17)  # wdFormatPDF
+            finally:
+                doc.Close(0)
+
+        def close():
+            try:
+                word.Quit()
+            except Exception:
+                # Word already crashed or disconnected
+                pass
+            pythoncom.CoUninitialize()
+
+        return convert_one, close
+
+    # Other platforms: docx2pdf talks to the single running Word app
+    return convert, lambda: None
+
+# Converter worker loop: {"docx": path, "pdf": path} -> {"ok": bool, "error": str}.
+# A failed conversion may mean Word itself crashed or disconnected, so the
+# worker exits after reporting it and the pool starts a fresh one.
+def _pdf_worker(conn, opener):
+    convert_one, close = opener()
+    try:
+        while True:
+            try:
+                job = conn.recv()
+            except EOFError:
+                break
+            if job is None:
+                break
+            try:
+                convert_one(job["docx"], job["pdf"])
+            except Exception as e:
+                conn.send({"ok": False, "error": str(e)})
+                break
+            conn.send({"ok": True})
+    finally:
+        close()
+
+# Pool of long-lived converter processes shared by all requests, so Word is
+# started once per worker instead of once per document. Workers are checked
+# out through an idle queue, so each one serves a single caller at a time.
+class PdfConverterPool:
+
+    # opener returns (convert_one, close) inside each worker; see _open_pdf_converter
+    def __init__(self, size: int, timeout: float, opener=_open_pdf_converter):
+        self.size = size
+        self.timeout = timeout
+        self._opener = opener
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def _spawn(self):
+        conn, child_conn = multiprocessing.Pipe()
+        proc = multiprocessing.Process(target=_pdf_worker, args=(child_conn, self._opener), daemon=True)
+        proc.start()
+        child_conn.close()
+        return proc, conn
+
+    # Started lazily, so importing the app (e.g. in render workers) spawns nothing
+    def _start(self):
+        with self._lock:
+            if not self._started:
+                for _ in range(self.size):
+                    self._idle.put(self._spawn())
+                self._started = True
+
+    # Stop a worker that failed, hung or died and start a fresh one. A worker
+    # that reported its error is given `grace` seconds to quit Word by itself.
+    def _replace(self, proc, conn, grace: float = 0):
+        proc.join(grace)
+        if proc.is_alive():
+            proc.kill()
+            proc.join()
+        conn.close()
+        return self._spawn()
+
+    # Convert one DOCX to PDF; blocks until done (at most `timeout` seconds)
+    # and raises on failure
+    def submit(self, docx_path: str, pdf_path: str):
+        self._start()
+        proc, conn = self._idle.get()
+        reply, reported = None, False
+        try:
+            conn.send({"docx": docx_path, "pdf": pdf_path})
+            # poll() first: a Word modal dialog would otherwise block recv() forever
+            if conn.poll(self.timeout):
+                reply = conn.recv()
+                reported = not reply["ok"]
+            else:
+                reply = {"ok": False, "error": f"PDF conversion timed out after {self.timeout:g} seconds"}
+        except (EOFError, OSError):
+            reply = {"ok": False, "error": "PDF converter stopped unexpectedly"}
+        finally:
+            if reply is None or not reply["ok"]:
+                proc, conn = self._replace(proc, conn, grace=5 if reported else 0)
+            self._idle.put((proc, conn))
+
+        if not reply["ok"]:
+            raise RuntimeError(reply["error"])
+
+# Only Windows gets one Word instance per worker; elsewhere there is a single Word app.
+# A conversion taking longer than PDF_TIMEOUT seconds is treated as a hung Word.
+PDF_CONVERTERS = PdfConverterPool(
+    int(os.environ.get("PDF_WORKERS", (os.cpu_count() or 1) if sys.platform == "win32" else 1)),
+    timeout=float(os.environ.get("PDF_TIMEOUT", 120)),
+)
+
+# Convert one rendered row to PDF. Returns the row's final status and the
+# outputs it produced as (kind, source, arcname), where source is the DOCX
+# bytes or the PDF path; anything that failed is simply not listed.
+def _convert_pdf(rendered_row: tuple, docx_dir: str, pdf_dir: str) -> tuple:
+    emp_name, base_name, status, docx_bytes = rendered_row
+    produced = []
+    if docx_bytes is not None:
+        produced.append(("DOCX", docx_bytes, f"DOCX/{base_name}.docx"))
+
+    if status == "Success":
+        pdf_path = os.path.join(pdf_dir, base_name + ".pdf")
+        try:
+            PDF_CONVERTERS.submit(os.path.join(docx_dir, base_name + ".docx"), pdf_path)
+            produced.append(("PDF", pdf_path, f"PDF/{base_name}.pdf"))
+        except Exception as e:
+            # If conversion fails, still mark error but keep DOCX
+            status = f"Error: {e}"
+    return emp_name, base_name, status, produced
 
 @app.route("/", methods=["GET", "POST"])
 def index():
@@ -89,39 +551,60 @@ def index():
         except Exception:
             preview_count = 5
 
-        with tempfile.TemporaryDirectory() as tmpdir:
+        fn_ops = compile_filename_template(filename_template)
 
-            # Save uploaded files to temp
-            excel_path = os.path.join(tmpdir, "employees.xlsx")
-            template_path = os.path.join(tmpdir, "template.docx")
-            excel_file.save(excel_path)
-            template_file.save(template_path)
+        # Validate the template before touching disk: a DOCX is a ZIP ("PK\x03\x04")
+        if template_file.stream.read(4) != b"PK\x03\x04":
+            flash("The NDA Template must be a .docx file.")
+            return redirect(url_for("index"))
+        template_file.stream.seek(0)
 
-            # Read Excel
-            try:
-                df = pd.read_excel(excel_path)
-            except Exception as e:
-                flash(f"Unable to read Excel file: {e}")
-                return redirect(url_for("index"))
+        # Validate the Excel columns from the header row only
+        try:
+            header_df = pd.read_excel(excel_file.stream, nrows=0, engine=EXCEL_ENGINE)
+        except Exception as e:
+            flash(f"Unable to read Excel file: {e}")
+            return redirect(url_for("index"))
+
+        required_cols = ["emp_name", "city", "state", "joining_date", "address", "gender"]
+        missing = [c for c in required_cols if c not in header_df.columns]
 
-            required_cols = ["emp_name", "city", "state", "joining_date", "address", "gender"]
-            missing = [c for c in required_cols if c not in df.columns]
+        if missing:
+            flash(f"Missing required Excel columns: {', '.join(missing)}")
+            return redirect(url_for("index"))
 
-            if missing:
-                flash(f"Missing required Excel columns: {', '.join(missing)}")
-                return redirect(url_for("index"))
+        # Read Excel straight from the upload; it is never saved to disk
+        excel_file.stream.seek(0)
+        try:
+            df = pd.read_excel(excel_file.stream, engine=EXCEL_ENGINE)
+        except Exception as e:
+            flash(f"Unable to read Excel file: {e}")
+            return redirect(url_for("index"))
+
+        if len(df) > app.config["MAX_ROWS"]:
+            flash(f"Too many employees: {len(df)} rows (maximum is {app.config['MAX_ROWS']}).")
+            return render_template("index.html"), 413
+
+        df = prepare_employees(df)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+
+            # Save uploaded template to temp
+            template_path = os.path.join(tmpdir, "template.docx")
+            template_file.save(template_path)
 
             # If user wanted preview only -> compute filenames for first N rows and show them
             if action == "preview":
                 preview_rows = []
-                for i, (_, row) in enumerate(df.iterrows(), start=1):
+                taken = set()
+                records = df[RECORD_COLUMNS].head(preview_count).itertuples(index=False, name=None)
+                for i, rec in enumerate(records, start=1):
+                    context = dict(zip(CONTEXT_KEYS, rec))
                     preview_rows.append({
                         "index": i,
-                        "emp_name": str(row.get("emp_name", "")).strip(),
-                        "filename": render_filename(filename_template, row, i) + ".docx"
+                        "emp_name": context["emp_name"],
+                        "filename": unique_filename(render_filename(fn_ops, context, i), taken) + ".docx"
                     })
-                    if i >= preview_count:
-                        break
 
                 result = {
                     "total": len(df),
@@ -144,90 +627,101 @@ def index():
             error_count = 0
             report_rows = []
 
-            # Process each employee
-            for i, (_, row) in enumerate(df.iterrows(), start=1):
-
-                emp_name = str(row["emp_name"]).strip()
-                city = str(row["city"]).strip()
-                state = str(row["state"]).strip()
-                joining_date = row["joining_date"]
-                address = str(row["address"]).strip()
-                gender = str(row["gender"]).strip().lower()
+            template_key = hash_template(template_path)
+            records = df[RECORD_COLUMNS].itertuples(index=False, name=None)
+            chunk_rows = max(1, min(
+                GENERATION_CHUNK,
+                GENERATION_CHUNK_BYTES // max(1, os.path.getsize(template_path)),
+            ))
 
-                his_or_her = "his" if gender in ["male", "m"] else "her"
+            # Filenames already used in this job, so a name repeated in any
+            # later chunk still gets its own files
+            taken = set()
 
-                # Format date
-                try:
-                    joining_date_str = pd.to_datetime(joining_date).strftime("%d-%m-%Y")
-                except:
-                    joining_date_str = str(joining_date)
-
-                doc = DocxTemplate(template_path)
-
-                context = {
-                    "emp_name": emp_name,
-                    "city": city,
-                    "state": state,
-                    "joining_date": joining_date_str,
-                    "address": address,
-                    "his_or_her": his_or_her,
-                }
-
-                # Use filename template
-                base_name = render_filename(filename_template, row, i)
-
-                word_path = os.path.join(docx_dir, base_name + ".docx")
-                pdf_path = os.path.join(pdf_dir, base_name + ".pdf")
-
-                try:
-                    # DOCX
-                    doc.render(context)
-                    doc.save(word_path)
-
-                    # PDF conversion - convert may raise; catch it
-                    try:
-                        convert(word_path, pdf_path)
-                    except Exception as conv_e:
-                        # If conversion fails, still mark error but keep DOCX
-                        raise conv_e
-
-                    status = "Success"
-                    success_count += 1
-
-                except Exception as e:
-                    status = f"Error: {e}"
-                    error_count += 1
-
-                report_rows.append({"emp_name": emp_name, "filename": base_name, "status": status})
-
-            # Create ZIP in memory
-            zip_buffer = io.BytesIO()
-
-            with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
-
-                # Add DOCX
-                for f in os.listdir(docx_dir):
-                    zipf.write(os.path.join(docx_dir, f), f"DOCX/{f}")
-
-                # Add PDF
-                for f in os.listdir(pdf_dir):
-                    zipf.write(os.path.join(pdf_dir, f), f"PDF/{f}")
-
-                # Add report Excel
-                report_df = pd.DataFrame(report_rows)
+            # Unique ZIP ID
+            zip_id = str(uuid.uuid4())
+            zip_path = os.path.join(app.config["ZIP_CACHE_DIR"], f"{zip_id}.zip")
+
+            # Create ZIP on disk. DOCX, PDF and XLSX are already compressed,
+            # so store them as-is rather than deflating them again.
+            with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED, allowZip64=True) as zipf, \
+                    ThreadPoolExecutor(max_workers=PDF_CONVERTERS.size) as converter_threads:
+
+                # Generate in chunks, flushing each chunk into the ZIP and deleting
+                # its files, so memory and temp disk stay bounded for large sheets
+                for start in range(0, total, chunk_rows):
+                    chunk = list(islice(records, chunk_rows))
+
+                    # Resolve the chunk's filenames before any row is dispatched, so
+                    # rows with the same name get distinct files instead of racing
+                    base_names = [
+                        unique_filename(render_filename(fn_ops, dict(zip(CONTEXT_KEYS, rec)), i), taken)
+                        for i, rec in enumerate(chunk, start=start + 1)
+                    ]
+
+                    # Render DOCX files in parallel; rendering is CPU-bound, so use
+                    # processes rather than threads. Chunks can be only a few rows
+                    # for large templates, so rows are handed out one at a time.
+                    rendered = get_render_pool().map(
+                        _render_one,
+                        repeat(template_key),
+                        repeat(template_path),
+                        chunk,
+                        base_names,
+                        repeat(docx_dir),
+                    )
+
+                    # PDF conversion - hand each DOCX to the shared converter pool as
+                    # it is rendered; threads here only wait on the converter processes
+                    converted = converter_threads.map(
+                        _convert_pdf,
+                        rendered,
+                        repeat(docx_dir),
+                        repeat(pdf_dir),
+                    )
+
+                    # Outputs in the order they were produced: (kind, source, arcname)
+                    produced = []
+
+                    for emp_name, base_name, status, row_outputs in converted:
+                        if status == "Success":
+                            success_count += 1
+                        else:
+                            error_count += 1
+                        report_rows.append({"emp_name": emp_name, "filename": base_name, "status": status})
+                        produced.extend(row_outputs)
+
+                    # Add DOCX straight from the rendered bytes and PDFs from disk,
+                    # in production order; no directory listing needed
+                    for kind, src, arcname in produced:
+                        if kind == "DOCX":
+                            zipf.writestr(arcname, src)
+                        else:
+                            zipf.write(src, arcname)
+
+                    # Free this chunk's files before the next one
+                    for d in (docx_dir, pdf_dir):
+                        shutil.rmtree(d)
+                        os.makedirs(d)
+
+                # Add report Excel; xlsxwriter's constant_memory mode writes each row
+                # out as it goes. Rows are written directly because pandas writes
+                # column by column, which constant_memory silently drops.
                 report_io = io.BytesIO()
+                workbook = xlsxwriter.Workbook(
+                    report_io, {"constant_memory": True, "strings_to_urls": False}
+                )
+                worksheet = workbook.add_worksheet("Report")
+                report_cols = ["emp_name", "filename", "status"]
+                worksheet.write_row(0, 0, report_cols)
+                for r, report_row in enumerate(report_rows, start=1):
+                    worksheet.write_row(r, 0, [report_row[c] for c in report_cols])
+                workbook.close()
 
-                with pd.ExcelWriter(report_io, engine="openpyxl") as writer:
-                    report_df.to_excel(writer, index=False, sheet_name="Report")
+                zipf.writestr("NDA_Report.xlsx", report_io.getvalue())
 
-                report_io.seek(0)
-                zipf.writestr("NDA_Report.xlsx", report_io.read())
-
-            zip_buffer.seek(0)
-
-            # Unique ZIP ID
-            zip_id = str(uuid.uuid4())
-            GENERATED_ZIPS[zip_id] = zip_buffer
+            GENERATED_ZIPS[zip_id] = (zip_path, os.path.getmtime(zip_path))
+            _ensure_eviction()
 
             # ⏳ Accurate time calculation
             elapsed = time.perf_counter() - start_time
@@ -256,17 +750,25 @@ def index():
 
 @app.route("/download/<zip_id>")
 def download_zip(zip_id):
+    # Unknown IDs are rejected before a lock is created for them
     if zip_id not in GENERATED_ZIPS:
         return "Invalid or expired download link.", 404
 
-    # Seek to start for send_file
-    GENERATED_ZIPS[zip_id].seek(0)
-    return send_file(
-        GENERATED_ZIPS[zip_id],
-        as_attachment=True,
-        download_name="NDA_Forms.zip",
-        mimetype="application/zip",
-    )
+    with _zip_lock(zip_id):
+        entry = GENERATED_ZIPS.get(zip_id)
+        if entry is None or not os.path.exists(entry[0]):
+            return "Invalid or expired download link.", 404
+
+        # Served from disk with conditional/Range support, so downloads can resume.
+        # The file is opened here, so eviction can't remove it underneath us.
+        return send_from_directory(
+            app.config["ZIP_CACHE_DIR"],
+            f"{zip_id}.zip",
+            as_attachment=True,
+            download_name="NDA_Forms.zip",
+            mimetype="application/zip",
+            conditional=True,
+        )
 
 
 if __name__ == "__main__":
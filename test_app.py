@@ -0,0 +1,281 @@
+import io
+import os
+import re
+import shutil
+import time
+import warnings
+import zipfile
+
+import pandas as pd
+import pytest
+from docxtpl import DocxTemplate
+
+import app as nda_app
+
+TEMPLATE_PATH = "Non-Disclosure Agreement(NDA)_Template.docx"
+COLUMNS = ["emp_name", "city", "state", "joining_date", "address", "gender"]
+CONTEXT = {
+    "emp_name": "Asha Rao", "city": "Pune", "state": "MH",
+    "joining_date": "15-03-2023", "address": "1 Main St", "his_or_her": "her",
+}
+
+
+# Fake PDF converter for PdfConverterPool workers. "bad" fails the way a
+# crashed Word instance does (every later call fails too), "hang" never
+# finishes and "die" kills the worker process.
+def flaky_converter():
+    state = {"crashed": False}
+
+    def convert_one(docx_path: str, pdf_path: str):
+        name = os.path.basename(docx_path)
+        if name.startswith("die"):
+            os._exit(1)
+        if name.startswith("hang"):
+            time.sleep(60)
+        if state["crashed"] or name.startswith("bad"):
+            state["crashed"] = True
+            raise RuntimeError("Word crashed")
+        shutil.copy(docx_path, pdf_path)
+
+    return convert_one, lambda: None
+
+
+def make_employees(rows: list) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def excel_bytes(df: pd.DataFrame) -> bytes:
+    buf = io.BytesIO()
+    df.to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+def post(client, df: pd.DataFrame, action: str, filename_template: str):
+    with open(TEMPLATE_PATH, "rb") as f:
+        template = f.read()
+    return client.post("/", data={
+        "employees_file": (io.BytesIO(excel_bytes(df)), "employees.xlsx"),
+        "template_file": (io.BytesIO(template), "template.docx"),
+        "filename_template": filename_template,
+        "preview_count": "5",
+        "action": action,
+    }, content_type="multipart/form-data")
+
+
+def download(client, resp) -> zipfile.ZipFile:
+    zip_id = re.search(r"/download/([\w-]+)", resp.get_data(as_text=True)).group(1)
+    return zipfile.ZipFile(io.BytesIO(client.get(f"/download/{zip_id}").data))
+
+
+def render_plain(template_path: str) -> zipfile.ZipFile:
+    doc = DocxTemplate(template_path)
+    doc.render(CONTEXT)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return zipfile.ZipFile(buf)
+
+
+def render_cached(template_path: str) -> zipfile.ZipFile:
+    cached = nda_app.CachedTemplate(template_path)
+    doc = cached.render(CONTEXT)
+    buf = io.BytesIO()
+    cached.save(doc, buf)
+    return zipfile.ZipFile(buf)
+
+
+@pytest.fixture
+def header_template(tmp_path):
+    # The bundled template with a Jinja tag added to one of its headers
+    path = tmp_path / "header_template.docx"
+    with zipfile.ZipFile(TEMPLATE_PATH) as src, zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            data = src.read(info)
+            if info.filename == "word/header2.xml":
+                data = data.replace(
+                    b"</w:hdr>",
+                    b"<w:p><w:r><w:t>Prepared for {{ emp_name }}</w:t></w:r></w:p></w:hdr>",
+                )
+            dst.writestr(info, data)
+    return str(path)
+
+
+@pytest.fixture
+def client():
+    nda_app.app.config["TESTING"] = True
+    return nda_app.app.test_client()
+
+
+def test_unique_filename_numbers_repeats_case_insensitively():
+    taken = set()
+    names = [nda_app.unique_filename(n, taken) for n in ["Asha", "Ravi", "Asha", "asha", "Asha (2)"]]
+    assert names == ["Asha", "Ravi", "Asha (2)", "asha (3)", "Asha (2) (2)"]
+
+
+def test_generate_gives_repeated_names_their_own_files(client):
+    df = make_employees([
+        ["Asha", "Pune", "MH", "2023-03-15", f"Address {i}", "f"] for i in range(1, 5)
+    ])
+    resp = post(client, df, "generate", "{emp_name} LCF NDA Form")
+    assert resp.status_code == 200
+    z = download(client, resp)
+    docx_names = [n for n in z.namelist() if n.startswith("DOCX/")]
+    assert len(docx_names) == len(set(docx_names)) == 4
+
+    # Each row keeps its own file, numbered in row order
+    report = pd.read_excel(io.BytesIO(z.read("NDA_Report.xlsx")))
+    assert report["filename"].tolist() == [
+        "Asha LCF NDA Form", "Asha LCF NDA Form (2)", "Asha LCF NDA Form (3)", "Asha LCF NDA Form (4)",
+    ]
+    for i, name in enumerate(report["filename"], start=1):
+        with zipfile.ZipFile(io.BytesIO(z.read(f"DOCX/{name}.docx"))) as docx:
+            assert f"Address {i}".encode() in docx.read("word/document.xml")
+
+
+def test_prepare_employees_blank_cells_become_empty_text():
+    df = make_employees([
+        ["  Asha ", "Pune", "MH", "2023-03-15", "1 Main St", "Female"],
+        [None, None, None, None, None, None],
+    ])
+    out = nda_app.prepare_employees(df)
+    columns = ["emp_name", "city", "state", "_joining_date_fmt", "address", "his_or_her"]
+    records = out[columns].values.tolist()
+    assert records[0] == ["Asha", "Pune", "MH", "15-03-2023", "1 Main St", "her"]
+    assert records[1] == ["", "", "", "", "", "her"]
+
+
+def test_prepare_employees_parses_each_date_format():
+    df = make_employees([
+        ["A", "", "", "2023-03-15", "", "m"],
+        ["B", "", "", "15/04/2023", "", "m"],
+        ["C", "", "", "March 5, 2023", "", "m"],
+        ["D", "", "", "not a date", "", "m"],
+    ])
+    out = nda_app.prepare_employees(df)
+    assert out["_joining_date_fmt"].tolist() == [
+        "15-03-2023", "15-04-2023", "05-03-2023", "not a date",
+    ]
+
+
+def test_preview_with_blank_name(client):
+    df = make_employees([
+        [None, "Pune", "MH", "2023-03-15", "1 Main St", "Male"],
+        ["Ravi", "Delhi", "DL", "15/04/2023", "2 Ring Rd", "male"],
+    ])
+    resp = post(client, df, "preview", "{index} {emp_name} {joining_date}")
+    assert resp.status_code == 200
+    names = re.findall(r"→ <code>(.*?)</code>", resp.get_data(as_text=True))
+    assert names == ["1 15-03-2023.docx", "2 Ravi 15-04-2023.docx"]
+
+
+def test_render_filename_accepts_non_text_values():
+    fn_ops = nda_app.compile_filename_template("{index} {emp_name} {city}")
+    context = {"emp_name": float("nan"), "city": 7}
+    assert nda_app.render_filename(fn_ops, context, 3) == "3 nan 7"
+
+
+@pytest.mark.parametrize("failing, error", [
+    ("bad.docx", "Word crashed"),
+    ("hang.docx", "timed out"),
+    ("die.docx", "stopped unexpectedly"),
+])
+def test_pdf_pool_replaces_failed_worker(tmp_path, failing, error):
+    pool = nda_app.PdfConverterPool(1, timeout=2, opener=flaky_converter)
+    for name in (failing, "good.docx"):
+        (tmp_path / name).write_bytes(b"docx")
+
+    with pytest.raises(RuntimeError, match=error):
+        pool.submit(str(tmp_path / failing), str(tmp_path / "failed.pdf"))
+
+    # The next conversion gets a fresh worker rather than the broken one
+    pool.submit(str(tmp_path / "good.docx"), str(tmp_path / "good.pdf"))
+    assert (tmp_path / "good.pdf").read_bytes() == b"docx"
+
+
+def test_download_unknown_id_creates_no_lock(client):
+    locks_before = len(nda_app.ZIP_LOCKS)
+    for i in range(50):
+        assert client.get(f"/download/not-a-zip-{i}").status_code == 404
+    assert len(nda_app.ZIP_LOCKS) == locks_before
+
+
+def test_eviction_only_removes_expired_generated_zips(tmp_path, monkeypatch):
+    monkeypatch.setitem(nda_app.app.config, "ZIP_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(nda_app, "_schedule_eviction", lambda: None)
+    expired_id, fresh_id = str(nda_app.uuid.uuid4()), str(nda_app.uuid.uuid4())
+    old = time.time() - nda_app.app.config["ZIP_TTL"] - 60
+    files = {
+        "expired": tmp_path / f"{expired_id}.zip",
+        "fresh": tmp_path / f"{fresh_id}.zip",
+        "other": tmp_path / "backup.zip",
+        "notes": tmp_path / f"{expired_id}.txt",
+    }
+    for name, path in files.items():
+        path.write_bytes(b"zip")
+        if name != "fresh":
+            os.utime(path, (old, old))
+    monkeypatch.setitem(nda_app.GENERATED_ZIPS, expired_id, (str(files["expired"]), old))
+    locks_before = set(nda_app.ZIP_LOCKS)
+
+    nda_app._evict_expired_zips()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+        files[name].name for name in ("fresh", "other", "notes")
+    )
+    assert expired_id not in nda_app.GENERATED_ZIPS
+    assert set(nda_app.ZIP_LOCKS) - locks_before <= {fresh_id}
+
+
+# Two rows per chunk for the bundled template; PDFs are faked by copying the DOCX
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(nda_app, "GENERATION_CHUNK_BYTES", 2 * os.path.getsize(TEMPLATE_PATH))
+    monkeypatch.setattr(nda_app.PDF_CONVERTERS, "submit", lambda docx, pdf: shutil.copy(docx, pdf))
+
+
+def test_generate_splits_large_templates_into_small_chunks(client, small_chunks):
+    df = make_employees([
+        [f"Emp {i}", "Pune", "MH", "2023-03-15", "1 Main St", "m"] for i in range(1, 6)
+    ])
+    resp = post(client, df, "generate", "{index} {emp_name}")
+    assert resp.status_code == 200
+    expected = []
+    for i in range(1, 6):
+        expected += [f"DOCX/{i} Emp {i}.docx", f"PDF/{i} Emp {i}.pdf"]
+    assert download(client, resp).namelist() == expected + ["NDA_Report.xlsx"]
+
+
+def test_generate_keeps_names_unique_across_chunks(client, small_chunks):
+    # Chunks are [Asha, Ravi] and [Asha, asha]
+    df = make_employees([
+        [name, "Pune", "MH", "2023-03-15", "1 Main St", "f"] for name in ["Asha", "Ravi", "Asha", "asha"]
+    ])
+    with warnings.catch_warnings():
+        warnings.filterwarnings("error", "Duplicate name")
+        resp = post(client, df, "generate", "{emp_name} LCF NDA Form")
+    assert resp.status_code == 200
+    names = download(client, resp).namelist()
+    assert len(names) == len(set(names))
+    stems = ["Asha LCF NDA Form", "Ravi LCF NDA Form", "Asha LCF NDA Form (2)", "asha LCF NDA Form (3)"]
+    assert sorted(names) == sorted(
+        [f"DOCX/{s}.docx" for s in stems] + [f"PDF/{s}.pdf" for s in stems] + ["NDA_Report.xlsx"]
+    )
+
+
+def test_cached_template_matches_plain_render():
+    assert nda_app.DOCXTPL_FAST_PATH
+    assert nda_app.CachedTemplate(TEMPLATE_PATH).base_zip is not None
+    plain, cached = render_plain(TEMPLATE_PATH), render_cached(TEMPLATE_PATH)
+    assert sorted(cached.namelist()) == sorted(plain.namelist())
+    assert cached.read("word/document.xml") == plain.read("word/document.xml")
+    assert b"Asha Rao" in cached.read("word/document.xml")
+
+
+def test_cached_template_renders_jinja_in_headers(header_template):
+    # Jinja outside the body rules out the pre-compressed package
+    assert nda_app.CachedTemplate(header_template).base_zip is None
+    plain, cached = render_plain(header_template), render_cached(header_template)
+    assert cached.read("word/document.xml") == plain.read("word/document.xml")
+    header = cached.read("word/header2.xml")
+    assert header == plain.read("word/header2.xml")
+    assert b"Prepared for Asha Rao" in header
+    assert b"{{" not in header